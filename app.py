@@ -1,21 +1,111 @@
+import argparse
+import hashlib
 import sqlite3
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from html import escape
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyarrow import csv as pacsv
+import matplotlib
+
+# Output is always a file, so select the non-interactive backend before pyplot loads a GUI toolkit
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
-import seaborn as sns
+
+try:
+    import duckdb
+except ImportError:  # optional: fall back to the pandas implementation
+    duckdb = None
 
 
 PROJECT_DIR = Path(__file__).parent
 CSV_PATH = PROJECT_DIR / "emissions.csv"
 DB_PATH = PROJECT_DIR / "emissions.db"
+PARQUET_PATH = PROJECT_DIR / "emissions.parquet"
 DOCS_DIR = PROJECT_DIR / "docs"
+REPORT_HASH_PATH = DOCS_DIR / ".cache_hash"
+CHART_FILENAME = "top5_emissions.svg"
+# Parquet schema metadata key recording the sha256 of the CSV the cache was built from
+PARQUET_HASH_KEY = b"emissions_csv_sha256"
+
+# Column types matching the SQLite schema, so every report path sees the same data
+CSV_COLUMN_TYPES = {"industry": pa.string(), "year": pa.int64(), "emissions_mtco2e": pa.float64()}
+# Bytes of CSV parsed per record batch when streaming into SQLite (tens of thousands of rows)
+CSV_BLOCK_SIZE = 1 << 21
+
+# SQL statements, gathered in one place
+INSERT_EMISSIONS_SQL = "INSERT INTO emissions VALUES (?, ?, ?);"
+# One pass returns both the latest year and its totals instead of a separate MAX(year) query
+LATEST_YEAR_TOTALS_SQL = """
+WITH latest_year AS (
+  SELECT MAX(year) AS year FROM emissions
+)
+SELECT e.industry,
+       SUM(e.emissions_mtco2e) AS total_emissions,
+       ly.year AS latest_year
+FROM emissions e
+JOIN latest_year ly ON e.year = ly.year
+GROUP BY e.industry, ly.year
+ORDER BY total_emissions DESC;
+"""
+
+
+def read_emissions_csv(csv_path: Path) -> pa.Table:
+    convert_options = pacsv.ConvertOptions(column_types=CSV_COLUMN_TYPES)
+    return pacsv.read_csv(csv_path, convert_options=convert_options)
 
 
-def initialize_database_with_csv(csv_path: Path, db_path: Path) -> None:
-    connection = sqlite3.connect(db_path)
+def open_emissions_csv(csv_path: Path) -> pacsv.CSVStreamingReader:
+    read_options = pacsv.ReadOptions(block_size=CSV_BLOCK_SIZE)
+    convert_options = pacsv.ConvertOptions(column_types=CSV_COLUMN_TYPES)
+    return pacsv.open_csv(csv_path, read_options=read_options, convert_options=convert_options)
+
+
+def load_csv_extension(connection: sqlite3.Connection) -> bool:
+    # The csv virtual table is a loadable extension, and many Python builds disable extension loading
+    try:
+        connection.enable_load_extension(True)
+    except (AttributeError, sqlite3.NotSupportedError):
+        return False
     try:
+        connection.load_extension("csv")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        connection.enable_load_extension(False)
+
+
+def prefetch_batches(reader: pacsv.CSVStreamingReader, executor: ThreadPoolExecutor) -> Iterator[pa.RecordBatch]:
+    # Parse the next batch on the worker thread while the caller inserts the current one
+    pending = executor.submit(reader.read_next_batch)
+    while True:
+        try:
+            batch = pending.result()
+        except StopIteration:
+            return
+        pending = executor.submit(reader.read_next_batch)
+        yield batch
+
+
+def initialize_database_with_csv(csv_path: Path, connection: sqlite3.Connection) -> None:
+    use_csv_vtab = load_csv_extension(connection)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # pyarrow parses without holding the GIL, so the first block is read while SQLite builds the table
+        reader_future = None if use_csv_vtab else executor.submit(open_emissions_csv, csv_path)
+
         cursor = connection.cursor()
+        # The table is rebuilt from the CSV on every run, so trade durability for load speed.
+        # These settings only last for this connection.
+        cursor.execute("PRAGMA synchronous=OFF;")
+        cursor.execute("PRAGMA journal_mode=MEMORY;")
+        cursor.execute("PRAGMA temp_store=MEMORY;")
+        cursor.execute("PRAGMA cache_size=-200000;")
         cursor.execute("DROP TABLE IF EXISTS emissions;")
         cursor.execute(
             """
@@ -27,95 +117,146 @@ def initialize_database_with_csv(csv_path: Path, db_path: Path) -> None:
             """
         )
 
-        df = pd.read_csv(csv_path)
-        df.to_sql("emissions", connection, if_exists="append", index=False)
-
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_emissions_year ON emissions(year);")
-        cursor.execute(
-            "CREATE INDEX IF NOT EXISTS idx_emissions_industry_year ON emissions(industry, year);"
-        )
+        connection.execute("BEGIN")
+        if use_csv_vtab:
+            # Let SQLite parse the CSV itself so no rows cross into Python
+            filename = str(csv_path).replace("'", "''")
+            cursor.execute(f"CREATE VIRTUAL TABLE temp.emissions_csv USING csv(filename='{filename}', header=YES);")
+            # No CAST: it would turn blank or non-numeric cells into 0. Column affinity converts
+            # valid numbers and leaves anything else as text, which the typeof() check rejects.
+            cursor.execute(
+                """
+                INSERT INTO emissions
+                SELECT industry, year, emissions_mtco2e
+                FROM temp.emissions_csv
+                WHERE industry <> '' AND year <> '' AND emissions_mtco2e <> '';
+                """
+            )
+            csv_rows = cursor.execute("SELECT COUNT(*) FROM temp.emissions_csv;").fetchone()[0]
+            valid_rows = cursor.execute(
+                "SELECT COUNT(*) FROM emissions WHERE typeof(year) = 'integer' AND typeof(emissions_mtco2e) = 'real';"
+            ).fetchone()[0]
+            cursor.execute("DROP TABLE temp.emissions_csv;")
+            if valid_rows != csv_rows:
+                raise ValueError(f"{csv_path} has {csv_rows - valid_rows} rows with missing or non-numeric values")
+        else:
+            # Stream the CSV one batch at a time so memory stays bounded by the block size
+            for batch in prefetch_batches(reader_future.result(), executor):
+                rows = zip(*(column.to_pylist() for column in batch.columns))
+                cursor.executemany(INSERT_EMISSIONS_SQL, rows)
         connection.commit()
-    finally:
-        connection.close()
-
-
-def fetch_most_recent_year(connection: sqlite3.Connection) -> int:
-    cursor = connection.cursor()
-    cursor.execute("SELECT MAX(year) FROM emissions;")
-    row = cursor.fetchone()
-    return int(row[0]) if row and row[0] is not None else None
-
-
-def fetch_totals_for_latest_year(connection: sqlite3.Connection) -> pd.DataFrame:
-    query = (
-        """
-        WITH latest_year AS (
-          SELECT MAX(year) AS year FROM emissions
-        ), totals AS (
-          SELECT e.industry,
-                 SUM(e.emissions_mtco2e) AS total_emissions
-          FROM emissions e
-          JOIN latest_year ly ON e.year = ly.year
-          GROUP BY e.industry
-        )
-        SELECT industry, total_emissions
-        FROM totals
-        ORDER BY total_emissions DESC;
-        """
+
+    # Build the index once on the loaded table instead of updating it per row. It covers every
+    # column the report reads, so MAX(year) and the per-industry totals never touch the table.
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_emissions_cover ON emissions(year, industry, emissions_mtco2e);"
     )
-    return pd.read_sql_query(query, connection)
-
-
-def fetch_top5_ranked(connection: sqlite3.Connection) -> pd.DataFrame:
-    query = (
-        """
-        WITH latest_year AS (
-          SELECT MAX(year) AS year FROM emissions
-        ), totals AS (
-          SELECT e.industry,
-                 SUM(e.emissions_mtco2e) AS total_emissions
-          FROM emissions e
-          JOIN latest_year ly ON e.year = ly.year
-          GROUP BY e.industry
-        ), ranked AS (
-          SELECT industry,
-                 total_emissions,
-                 RANK() OVER (ORDER BY total_emissions DESC) AS emissions_rank
-          FROM totals
-        )
-        SELECT industry, total_emissions, emissions_rank
-        FROM ranked
-        WHERE emissions_rank <= 5
-        ORDER BY emissions_rank, industry;
-        """
+    connection.commit()
+
+
+# The fetch_* queries run unchanged on either SQLite or DuckDB
+def read_query(query: str, connection: "sqlite3.Connection | duckdb.DuckDBPyConnection") -> pd.DataFrame:
+    cursor = connection.execute(query)
+    if isinstance(connection, sqlite3.Connection):
+        # Build the frame straight from the fetched tuples; pd.read_sql_query adds per-call introspection
+        return pd.DataFrame.from_records(cursor.fetchall(), columns=[column[0] for column in cursor.description])
+    return cursor.df()
+
+
+def fetch_totals_for_latest_year(
+    connection: "sqlite3.Connection | duckdb.DuckDBPyConnection",
+) -> tuple[int, pd.DataFrame]:
+    result = read_query(LATEST_YEAR_TOTALS_SQL, connection)
+    most_recent_year = int(result["latest_year"].iloc[0]) if not result.empty else None
+    return most_recent_year, result[["industry", "total_emissions"]]
+
+
+def parquet_cache_hash(parquet_path: Path) -> str:
+    metadata = pq.read_schema(parquet_path).metadata or {}
+    return metadata.get(PARQUET_HASH_KEY, b"").decode("ascii")
+
+
+def load_emissions(csv_path: Path, parquet_path: Path, csv_hash: str) -> pd.DataFrame:
+    # Reuse the columnar cache only if it was built from a CSV with the same contents; mtimes
+    # are not reliable because copies and archive extraction can make a newer CSV look older
+    # A handful of industries repeat on every row, so industry is converted straight to a
+    # category (integer codes) while reading, without building a column of Python strings first
+    if parquet_path.exists() and parquet_cache_hash(parquet_path) == csv_hash:
+        df = pq.read_table(parquet_path, read_dictionary=["industry"]).to_pandas()
+    else:
+        table = read_emissions_csv(csv_path)
+        metadata = {**(table.schema.metadata or {}), PARQUET_HASH_KEY: csv_hash.encode("ascii")}
+        pq.write_table(table.replace_schema_metadata(metadata), parquet_path, compression="zstd")
+        df = table.to_pandas(strings_to_categorical=True)
+
+    # Dictionary order follows first appearance; sort the categories so ties in the top 5
+    # still break alphabetically by industry
+    df["industry"] = df["industry"].cat.reorder_categories(sorted(df["industry"].cat.categories))
+    return df
+
+
+def compute_totals_for_latest_year(df: pd.DataFrame) -> tuple[int, pd.DataFrame]:
+    most_recent_year = int(df["year"].max()) if not df.empty else None
+    latest = df[df["year"] == most_recent_year]
+    totals = latest.groupby("industry", sort=False, observed=True)["emissions_mtco2e"].sum()
+    return most_recent_year, (
+        totals.sort_values(ascending=False)
+        .rename("total_emissions")
+        .reset_index()
     )
-    return pd.read_sql_query(query, connection)
+
+
+def compute_top5_ranked(totals_df: pd.DataFrame) -> pd.DataFrame:
+    # keep="all" retains ties at 5th place, matching RANK() <= 5
+    top5 = totals_df.nlargest(5, "total_emissions", keep="all").copy()
+    top5["emissions_rank"] = top5["total_emissions"].rank(method="min", ascending=False).astype(int)
+    return top5.sort_values(["emissions_rank", "industry"]).reset_index(drop=True)
 
 
 def plot_top5_bar(top5_df: pd.DataFrame, output_path: Path) -> None:
+    # top5_df is already ordered by rank; barh draws bottom-up, so reverse to keep the
+    # largest emitter (darkest bar) on top
+    plot_df = top5_df.iloc[::-1]
+    colors = plt.cm.Reds_r(np.linspace(0.85, 0.1, len(plot_df)))
     plt.figure(figsize=(9, 5))
-    sns.barplot(
-        data=top5_df.sort_values("total_emissions", ascending=False),
-        x="total_emissions",
-        y="industry",
-        palette="Reds_r",
-    )
+    plt.barh(plot_df["industry"], plot_df["total_emissions"], color=colors)
     plt.xlabel("Emissions (MtCO₂e)")
     plt.ylabel("Industry")
     plt.title("Top 5 Highest Emitting Industries (Most Recent Year)")
-    plt.tight_layout()
-    plt.savefig(output_path, dpi=160)
-    # Optional: display if running interactively
-    # plt.show()
+    plt.subplots_adjust(left=0.18, right=0.98, top=0.92, bottom=0.11)
+    # Emit labels as SVG text instead of glyph outlines to keep the file small
+    with plt.rc_context({"svg.fonttype": "none"}):
+        plt.savefig(output_path)
+
+
+def format_html_cell(value) -> str:
+    # Round floats to pandas' display precision so summation noise (0.30000000000000004) stays hidden;
+    # values too small to survive the rounding switch to scientific notation, as pandas does
+    if isinstance(value, float):
+        precision = pd.get_option("display.precision")
+        if value != 0 and abs(value) < 10**-precision:
+            return f"{value:.{precision}e}"
+        value = round(value, precision)
+    return escape(str(value))
+
+
+def render_html_table(df: pd.DataFrame) -> str:
+    # A single join over the rows; DataFrame.to_html runs pandas' per-cell formatter instead
+    head = "".join(f"<th>{escape(str(column))}</th>" for column in df.columns)
+    body = "".join(
+        "<tr>" + "".join(f"<td>{format_html_cell(value)}</td>" for value in row) + "</tr>"
+        for row in df.itertuples(index=False, name=None)
+    )
+    return f'<table class="table"><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>'
 
 
 def write_static_report(most_recent_year: int, totals_df: pd.DataFrame, top5_df: pd.DataFrame, output_dir: Path) -> Path:
     output_dir.mkdir(parents=True, exist_ok=True)
-    chart_path = output_dir / "top5_emissions.png"
+    chart_path = output_dir / CHART_FILENAME
     plot_top5_bar(top5_df, chart_path)
 
-    totals_table_html = totals_df.to_html(index=False, classes="table", border=0)
-    top5_table_html = top5_df.to_html(index=False, classes="table", border=0)
+    totals_table_html = render_html_table(totals_df)
+    top5_table_html = render_html_table(top5_df)
 
     html = f"""
 <!DOCTYPE html>
@@ -148,7 +289,7 @@ def write_static_report(most_recent_year: int, totals_df: pd.DataFrame, top5_df:
     <div class=\"card\">
       <h2>Top 5 Highest Emitting Industries</h2>
       <p class=\"muted\">Based on total MtCOe in the most recent year.</p>
-      <img src=\"top5_emissions.png\" alt=\"Top 5 emissions chart\" />
+      <img src=\"{CHART_FILENAME}\" alt=\"Top 5 emissions chart\" />
       {top5_table_html}
     </div>
 
@@ -174,33 +315,83 @@ python app.py</code></pre>
     return index_path
 
 
-def main() -> None:
-    if not CSV_PATH.exists():
-        raise FileNotFoundError(f"CSV not found at {CSV_PATH}")
+def hash_file(path: Path) -> str:
+    # Read in fixed-size blocks so hashing a large CSV does not load it into memory
+    digest = hashlib.sha256()
+    with path.open("rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-    initialize_database_with_csv(CSV_PATH, DB_PATH)
 
-    connection = sqlite3.connect(DB_PATH)
-    try:
-        most_recent_year = fetch_most_recent_year(connection)
-        totals_df = fetch_totals_for_latest_year(connection)
-        top5_df = fetch_top5_ranked(connection)
+def hash_report_inputs(csv_hash: str) -> str:
+    # Include this script so code changes also invalidate the cached report
+    digest = hashlib.sha256(csv_hash.encode("ascii"))
+    digest.update(hash_file(Path(__file__)).encode("ascii"))
+    return digest.hexdigest()
 
-        print(f"Most recent year: {most_recent_year}")
-        print("\nTotal emissions by industry (most recent year):")
-        print(totals_df.to_string(index=False))
 
-        print("\nTop 5 highest emitting industries:")
-        print(top5_df.to_string(index=False))
+def report_is_current(inputs_hash: str, output_dir: Path, hash_path: Path) -> bool:
+    if not (output_dir / "index.html").exists() or not (output_dir / CHART_FILENAME).exists():
+        return False
+    return hash_path.exists() and hash_path.read_text(encoding="utf-8") == inputs_hash
 
-        # Write GitHub Pages-friendly static report under docs/
-        report_index = write_static_report(most_recent_year, totals_df, top5_df, DOCS_DIR)
-        print(f"\nSaved GitHub Pages report to: {report_index}")
-    finally:
-        connection.close()
 
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Analyze industry carbon emissions and build the static report.")
+    parser.add_argument(
+        "--persist",
+        action="store_true",
+        help=f"load the CSV into SQLite at {DB_PATH.name} and run the report queries there",
+    )
+    args = parser.parse_args(argv)
 
-if __name__ == "__main__":
-    main()
+    if not CSV_PATH.exists():
+        raise FileNotFoundError(f"CSV not found at {CSV_PATH}")
+
+    # --persist always rebuilds the database, so only the report-only run can be skipped
+    csv_hash = hash_file(CSV_PATH)
+    inputs_hash = hash_report_inputs(csv_hash)
+    if not args.persist and report_is_current(inputs_hash, DOCS_DIR, REPORT_HASH_PATH):
+        print(f"Report is up to date: {DOCS_DIR / 'index.html'}")
+        return
+
+    if args.persist:
+        # Load and query over one connection so the load-time PRAGMAs also apply to the queries
+        connection = sqlite3.connect(DB_PATH)
+        try:
+            initialize_database_with_csv(CSV_PATH, connection)
+            most_recent_year, totals_df = fetch_totals_for_latest_year(connection)
+            top5_df = compute_top5_ranked(totals_df)
+        finally:
+            connection.close()
+    elif duckdb is not None:
+        # Query the DataFrame in place with DuckDB's vectorized engine; no table is created
+        connection = duckdb.connect()
+        try:
+            connection.register("emissions", load_emissions(CSV_PATH, PARQUET_PATH, csv_hash))
+            most_recent_year, totals_df = fetch_totals_for_latest_year(connection)
+            top5_df = compute_top5_ranked(totals_df)
+        finally:
+            connection.close()
+    else:
+        # The report only needs a group-by and a top-5, so compute it in pandas without a database
+        df = load_emissions(CSV_PATH, PARQUET_PATH, csv_hash)
+        most_recent_year, totals_df = compute_totals_for_latest_year(df)
+        top5_df = compute_top5_ranked(totals_df)
+
+    print(f"Most recent year: {most_recent_year}")
+    print("\nTotal emissions by industry (most recent year):")
+    print(totals_df.to_string(index=False))
+
+    print("\nTop 5 highest emitting industries:")
+    print(top5_df.to_string(index=False))
+
+    # Write GitHub Pages-friendly static report under docs/
+    report_index = write_static_report(most_recent_year, totals_df, top5_df, DOCS_DIR)
+    REPORT_HASH_PATH.write_text(inputs_hash, encoding="utf-8")
+    print(f"\nSaved GitHub Pages report to: {report_index}")
 
 
+if __name__ == "__main__":
+    main()
@@ -16,9 +16,8 @@ CREATE TABLE emissions (
 .mode csv
 .import --skip 1 'emissions.csv' emissions
 
--- Helpful indexes
-CREATE INDEX IF NOT EXISTS idx_emissions_year ON emissions(year);
-CREATE INDEX IF NOT EXISTS idx_emissions_industry_year ON emissions(industry, year);
+-- Covering index: the queries below are answered from the index alone
+CREATE INDEX IF NOT EXISTS idx_emissions_cover ON emissions(year, industry, emissions_mtco2e);
 
 -- 2) Find the most recent year in the dataset
 SELECT MAX(year) AS most_recent_year FROM emissions;